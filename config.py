@@ -1,10 +1,31 @@
 import os
+from functools import cache
 from dotenv import load_dotenv
 import logging
 
 logger = logging.getLogger(__name__)
 
-load_dotenv()
+
+@cache
+def _load_dotenv_once():
+    """Loads .env exactly once per process, even if called again from workers."""
+    load_dotenv()
+
+
+_load_dotenv_once()
+
+
+def _int_env(name, default):
+    """Reads an integer environment variable, falling back on bad values."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        logger.warning("WARNING: Environment variable %s='%s' is not a valid integer. Using default %s.", name, value, default)
+        return default
+
 
 class Config:
     """
@@ -19,7 +40,11 @@ class Config:
     EMAIL_RECEIVER_TO = os.getenv("EMAIL_RECEIVER_TO")
     EMAIL_RECEIVER_CC = os.getenv("EMAIL_RECEIVER_CC")
     SMTP_SERVER = os.getenv("SMTP_SERVER")
-    SMTP_PORT = int(os.getenv("SMTP_PORT", 587)) # Default to 587 if not set
+    SMTP_PORT = _int_env("SMTP_PORT", 587) # Default to 587 if not set
+
+    # Optional: also write the main report as a Parquet file for downstream
+    # pipelines (requires pandas + pyarrow).
+    WRITE_PARQUET = os.getenv("WRITE_PARQUET", "").strip().lower() in ("1", "true", "yes")
 
     @classmethod
     def validate_woo_config(cls):
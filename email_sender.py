@@ -1,7 +1,7 @@
 import smtplib
 import os
+import base64
 import logging
-import jdatetime
 from datetime import datetime, timedelta
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
@@ -10,6 +10,11 @@ from email.utils import formataddr
 
 logger = logging.getLogger(__name__)
 
+# Read attachments in ~64 KB blocks. The size is a multiple of 57 bytes so that
+# each block encodes to whole base64 lines and the encoded chunks can simply be
+# concatenated.
+ATTACHMENT_CHUNK_SIZE = 57 * 1150
+
 class EmailSender:
     """
     Handles sending emails with attachments.
@@ -22,23 +27,80 @@ class EmailSender:
         self.smtp_port = smtp_port
         self.receiver_to = [email.strip() for email in receiver_to.split(',')] if receiver_to else []
         self.receiver_cc = [email.strip() for email in receiver_cc.split(',')] if receiver_cc else []
+        self._smtp = None
 
-    def send_email_report(self, excel_file_paths):
+    def _get_server(self):
         """
-        Sends an email with the generated Excel reports as attachments.
+        Returns a connected, authenticated SMTP server, reusing the cached
+        connection when it is still alive to avoid repeating the TCP/TLS/AUTH
+        round-trips on every send.
         """
-        
-        if not self.sender_email or not self.sender_password or not self.smtp_server or not self.smtp_port:
-            logger.warning("WARNING: Email sending skipped due to missing sender/server credentials.")
-            return
-        
-        if not self.receiver_to and not self.receiver_cc:
-            logger.warning("WARNING: Email sending skipped as no TO or CC recipients are specified.")
-            return
+        if self._smtp is not None:
+            try:
+                if self._smtp.noop()[0] == 250:
+                    return self._smtp
+            except (smtplib.SMTPException, OSError):
+                pass  # Stale connection; fall through and reconnect.
+            self.close()
+
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port)
+        try:
+            server.starttls()
+            server.login(self.sender_email, self.sender_password)
+        except Exception:
+            server.close()
+            raise
+        self._smtp = server
+        return server
+
+    def close(self):
+        """Closes the cached SMTP connection, if any."""
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _build_attachment(self, f, filename):
+        """
+        Builds a base64-encoded MIME part by reading the open file in chunks,
+        so the raw file contents are never held in memory in full.
+        """
+        attach = MIMEApplication(b'', _subtype="xlsx")
+        del attach['Content-Transfer-Encoding']
+        attach['Content-Transfer-Encoding'] = 'base64'
+
+        encoded_chunks = []
+        while True:
+            chunk = f.read(ATTACHMENT_CHUNK_SIZE)
+            if not chunk:
+                break
+            encoded_chunks.append(base64.encodebytes(chunk))
+        attach.set_payload(b''.join(encoded_chunks))
+
+        attach.add_header('Content-Disposition', 'attachment', filename=filename)
+        return attach
+
+    def _build_message(self, excel_file_paths):
+        """
+        Builds the complete MIME message — headers, body and all report
+        attachments — in a single pass, so one message covers every report of
+        the run. Kept on the MIMEMultipart API because EmailMessage's
+        add_attachment requires the whole file as bytes, which would undo the
+        chunked attachment encoding.
+        """
+        import jdatetime
 
         msg = MIMEMultipart()
         msg['From'] = formataddr(('WooCommerce Report', self.sender_email))
-        
+
         if self.receiver_to:
             msg['To'] = ", ".join(self.receiver_to)
         if self.receiver_cc:
@@ -48,43 +110,81 @@ class EmailSender:
         yesterday_jalali_dt = jdatetime.datetime.fromgregorian(datetime=yesterday_dt_obj)
         subject_date_str = yesterday_jalali_dt.strftime('%Y-%m-%d')
         body_date_str = yesterday_jalali_dt.strftime('%Y/%m/%d')
-        
 
         msg['Subject'] = f"گزارش سفارشات سایت - {subject_date_str}"
-        
+
         body = f"با سلام،\n\nفایل اکسل گزارش سفارشات سایت برای روز گذشته ({body_date_str}) پیوست شده است.\n\nبا احترام - واحد انفورماتیک"
         msg.attach(MIMEText(body, 'plain'))
-        # <--- پایان تغییرات اصلی
 
         attached_files_count = 0
         for file_path in excel_file_paths:
-            if file_path and os.path.exists(file_path):
-                try:
-                    with open(file_path, 'rb') as f:
-                        attach = MIMEApplication(f.read(), _subtype="xlsx")
-                        attach.add_header('Content-Disposition', 'attachment', filename=os.path.basename(file_path))
-                        msg.attach(attach)
-                    logger.info(f"INFO: Excel file '{os.path.basename(file_path)}' successfully attached to email.")
-                    attached_files_count += 1
-                except Exception as e:
-                    logger.error(f"ERROR: Error attaching Excel file '{file_path}': {e}. This file will not be attached.")
-            else:
-                logger.warning(f"WARNING: Excel file '{file_path}' not found or invalid path. It will not be attached to email.")
-        
+            if not file_path:
+                logger.warning("WARNING: Excel file '%s' not found or invalid path. It will not be attached to email.", file_path)
+                continue
+            # Open directly instead of probing with os.path.exists first —
+            # saves a stat syscall and avoids the check/open race.
+            try:
+                f = open(file_path, 'rb')
+            except OSError:
+                logger.warning("WARNING: Excel file '%s' not found or invalid path. It will not be attached to email.", file_path)
+                continue
+            filename = os.path.basename(file_path)
+            try:
+                with f:
+                    msg.attach(self._build_attachment(f, filename))
+                logger.info("INFO: Excel file '%s' successfully attached to email.", filename)
+                attached_files_count += 1
+            except Exception as e:
+                logger.error("ERROR: Error attaching Excel file '%s': %s. This file will not be attached.", file_path, e)
+
         if attached_files_count == 0:
             logger.warning("WARNING: No valid Excel files were attached to the email.")
 
+        return msg
+
+    def _deliver(self, msg_bytes):
+        """
+        Sends the pre-serialized message, reconnecting and retrying once if
+        the cached SMTP connection was dropped mid-transaction. sendmail()
+        issues MAIL/RCPT/DATA back-to-back, which servers advertising
+        PIPELINING handle in a single round-trip.
+        """
+        all_recipients = self.receiver_to + self.receiver_cc
+        for attempt in range(2):
+            server = self._get_server()
+            try:
+                server.sendmail(self.sender_email, all_recipients, msg_bytes)
+                return
+            except smtplib.SMTPServerDisconnected:
+                self._smtp = None
+                if attempt == 1:
+                    raise
+                logger.warning("WARNING: SMTP connection dropped mid-send. Reconnecting and retrying once.")
+
+    def send_email_report(self, excel_file_paths):
+        """
+        Sends an email with the generated Excel reports as attachments.
+        """
+        if not self.sender_email or not self.sender_password or not self.smtp_server or not self.smtp_port:
+            logger.warning("WARNING: Email sending skipped due to missing sender/server credentials.")
+            return
+
+        if not self.receiver_to and not self.receiver_cc:
+            logger.warning("WARNING: Email sending skipped as no TO or CC recipients are specified.")
+            return
+
+        # Serialize once; retries reuse the same bytes instead of re-reading
+        # and re-encoding every attachment.
+        msg_bytes = self._build_message(excel_file_paths).as_bytes()
+
         try:
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.sender_email, self.sender_password)
-                
-                all_recipients = self.receiver_to + self.receiver_cc
-                server.send_message(msg, from_addr=self.sender_email, to_addrs=all_recipients)
-                logger.info(f"INFO: Email successfully sent to '{', '.join(self.receiver_to) if self.receiver_to else 'N/A'}' and CC to '{', '.join(self.receiver_cc) if self.receiver_cc else 'N/A'}'.")
+            self._deliver(msg_bytes)
+            logger.info("INFO: Email successfully sent to '%s' and CC to '%s'.",
+                        ', '.join(self.receiver_to) if self.receiver_to else 'N/A',
+                        ', '.join(self.receiver_cc) if self.receiver_cc else 'N/A')
         except smtplib.SMTPAuthenticationError:
             logger.error("ERROR: SMTP Authentication Error: Check your email username and password in .env.")
         except smtplib.SMTPConnectError:
-            logger.error(f"ERROR: SMTP Connection Error: Could not connect to '{self.smtp_server}' on port '{self.smtp_port}'. Check server address, port, or network.")
+            logger.error("ERROR: SMTP Connection Error: Could not connect to '%s' on port '%s'. Check server address, port, or network.", self.smtp_server, self.smtp_port)
         except Exception as e:
-            logger.error(f"ERROR: An unexpected error occurred while sending email: {e}")
\ No newline at end of file
+            logger.error("ERROR: An unexpected error occurred while sending email: %s", e)
\ No newline at end of file
@@ -1,34 +1,260 @@
-import pandas as pd
 from datetime import datetime, timedelta
+from functools import lru_cache
 import os
 import logging
-import jdatetime
-from openpyxl import load_workbook
-from openpyxl.styles import PatternFill, Font, Alignment
-from openpyxl.utils import get_column_letter
 import shutil
 
+# pandas, openpyxl and jdatetime are imported lazily inside the methods that
+# need them: together they add hundreds of ms to process start-up, which is
+# wasted whenever no report ends up being generated.
+
 logger = logging.getLogger(__name__)
 
+# Column order of the main report. Rows are accumulated as plain tuples in
+# this order, which is cheaper than one dict (and its key re-hashing in
+# pandas) per order. "_date_created" is an internal sort key dropped before
+# the report is written.
+MAIN_REPORT_COLUMNS = (
+    "_date_created",
+    "شماره سفارش", "تاریخ سفارش (شمسی)",
+    "نام", "نام خانوادگی",
+    "نام شرکت", "شناسه ملی", "شماره ثبت",
+    "آدرس", "شهر", "کد پستی", "تلفن", "عنوان روش پرداخت",
+    "مبلغ تخفیف",
+    "مجموع مبلغ سفارش (با مالیات)",
+    "مجموع نهایی سفارش (بدون مالیات)",
+    "مجموع مالیات بر ارزش افزوده",
+    "روش حمل و نقل", "مبلغ حمل و نقل",
+    "مبلغ استرداد کل سفارش",
+    "مجموع نهایی سفارش (پس از کسر استرداد و با مالیات)",
+    "نام آیتم‌ها", "تعداد آیتم‌ها (- استرداد)",
+    "قیمت واحد آیتم (بدون مالیات)", "مالیات بر ارزش افزوده آیتم",
+    "مجموع هزینه آیتم‌ها (با مالیات)",
+)
+
+# Layout of the "بدنه" sheet in the tis.xlsx template: first writable row and
+# the 1-based target columns for each line-item field.
+TEMPLATE_START_ROW = 2
+(TEMPLATE_COL_DESCRIPTION, TEMPLATE_COL_QUANTITY, TEMPLATE_COL_UNIT,
+ TEMPLATE_COL_UNIT_PRICE, TEMPLATE_COL_DISCOUNT, TEMPLATE_COL_VAT_RATE,
+ TEMPLATE_COL_OTHER_TAX_SUBJECT) = 3, 4, 5, 6, 10, 11, 12
+
+# Columns whose cells hold one line per item and need wrapped text.
+WRAP_TEXT_COLUMNS = frozenset([
+    "نام آیتم‌ها", "تعداد آیتم‌ها (- استرداد)",
+    "قیمت واحد آیتم (بدون مالیات)", "مالیات بر ارزش افزوده آیتم", "آدرس",
+])
+
+
+@lru_cache(maxsize=None)
+def _main_report_styles():
+    """
+    Constructs the openpyxl style objects for the main report once per
+    process. Kept behind a cached factory instead of module constants so the
+    openpyxl import stays lazy.
+    """
+    from openpyxl.styles import PatternFill, Font, Alignment
+
+    return {
+        'header_fill': PatternFill(start_color="CCE0F0", end_color="CCE0F0", fill_type="solid"),
+        'header_font': Font(bold=True),
+        'header_alignment': Alignment(horizontal='center', vertical='center'),
+        'item_name_fill': PatternFill(start_color="F0FFF0", end_color="F0FFF0", fill_type="solid"),
+        'wrap_text_alignment': Alignment(wrapText=True, vertical='top'),
+    }
+
+
+@lru_cache(maxsize=None)
+def _format_jalali_datetime(date_created):
+    """
+    Converts a WooCommerce 'date_created' string to a formatted Jalali
+    date/time. Cached so repeated timestamps are converted only once.
+    The output is assembled with an f-string because jdatetime's strftime
+    re-parses its format string in pure Python on every call.
+    """
+    import jdatetime
+
+    created = datetime.fromisoformat(date_created)
+    jalali = jdatetime.date.fromgregorian(date=created.date())
+    return (f"{jalali.year:04d}/{jalali.month:02d}/{jalali.day:02d} "
+            f"{created.hour:02d}:{created.minute:02d}:{created.second:02d}")
+
+
 class ExcelReporter:
     """
     Handles the creation and styling of Excel reports from order data.
     """
 
-    def _get_buyer_name(self, order):
+    def __init__(self, write_parquet=False):
+        self.write_parquet = write_parquet
+
+    def _write_parquet_archive(self, columns, rows, filename):
+        """
+        Writes a columnar archival copy of the main report. Parquet is an
+        order of magnitude faster to write and smaller than xlsx; the copy is
+        for downstream pipelines and is not attached to the email.
+        """
+        try:
+            import pandas as pd
+
+            pd.DataFrame(rows, columns=list(columns)).to_parquet(filename)
+        except ImportError:
+            logger.warning("WARNING: pandas/pyarrow not available. Skipping Parquet archive '%s'.", filename)
+        except Exception as e:
+            logger.error("ERROR: Error writing Parquet archive '%s': %s", filename, e)
+        else:
+            logger.info("INFO: Parquet archive '%s' written successfully.", filename)
+
+    def _write_main_report(self, columns, rows, filename):
+        """
+        Writes the styled main report in a single pass, preferring xlsxwriter
+        in constant_memory mode and falling back to openpyxl's write-only
+        mode when xlsxwriter is not installed.
+        """
+        try:
+            import xlsxwriter  # noqa: F401
+        except ImportError:
+            self._write_main_report_openpyxl(columns, rows, filename)
+        else:
+            self._write_main_report_xlsxwriter(columns, rows, filename)
+
+    def _write_main_report_xlsxwriter(self, columns, rows, filename):
+        """
+        Writes the styled main report with xlsxwriter. constant_memory mode
+        flushes each row to disk as it is written, keeping memory flat, and
+        column-level formats replace per-cell styling.
+        """
+        import xlsxwriter
+
+        workbook = xlsxwriter.Workbook(filename, {'constant_memory': True})
+        try:
+            sheet = workbook.add_worksheet("Sheet1")
+
+            header_format = workbook.add_format(
+                {'bold': True, 'bg_color': '#CCE0F0', 'align': 'center', 'valign': 'vcenter'})
+            wrap_format = workbook.add_format({'text_wrap': True, 'valign': 'top'})
+            item_name_format = workbook.add_format(
+                {'text_wrap': True, 'valign': 'top', 'bg_color': '#F0FFF0'})
+
+            column_widths = self._compute_column_widths(columns, rows)
+            for idx, col_name in enumerate(columns):
+                if col_name == "نام آیتم‌ها":
+                    col_format = item_name_format
+                elif col_name in WRAP_TEXT_COLUMNS:
+                    col_format = wrap_format
+                else:
+                    col_format = None
+                sheet.set_column(idx, idx, column_widths[idx], col_format)
+            sheet.freeze_panes(1, 0)
+
+            sheet.write_row(0, 0, columns, header_format)
+            for row_idx, row_values in enumerate(rows, start=1):
+                sheet.write_row(row_idx, 0, row_values)
+        finally:
+            workbook.close()
+
+    def _write_main_report_openpyxl(self, columns, rows, filename):
+        """
+        Fallback writer: streams styled rows through openpyxl's write-only
+        mode, serializing the file exactly once.
+        """
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.utils import get_column_letter
+
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet("Sheet1")
+
+        styles = _main_report_styles()
+        header_fill = styles['header_fill']
+        header_font = styles['header_font']
+        header_alignment = styles['header_alignment']
+        item_name_fill = styles['item_name_fill']
+        wrap_text_alignment = styles['wrap_text_alignment']
+
+        # Resolve each column's body style once, instead of re-checking column
+        # names for every cell of every row.
+        column_styles = [
+            (wrap_text_alignment if col_name in WRAP_TEXT_COLUMNS else None,
+             item_name_fill if col_name == "نام آیتم‌ها" else None)
+            for col_name in columns
+        ]
+
+        # Dimensions and panes must be configured before the first append in
+        # write-only mode.
+        for col_idx, width in enumerate(self._compute_column_widths(columns, rows), 1):
+            sheet.column_dimensions[get_column_letter(col_idx)].width = width
+        sheet.freeze_panes = "A2"
+
+        header_cells = []
+        for col_name in columns:
+            cell = WriteOnlyCell(sheet, value=col_name)
+            cell.fill = header_fill
+            cell.font = header_font
+            cell.alignment = header_alignment
+            header_cells.append(cell)
+        sheet.append(header_cells)
+
+        for row_values in rows:
+            row_cells = []
+            for (body_alignment, body_fill), value in zip(column_styles, row_values):
+                cell = WriteOnlyCell(sheet, value=value)
+                if body_alignment is not None:
+                    cell.alignment = body_alignment
+                if body_fill is not None:
+                    cell.fill = body_fill
+                row_cells.append(cell)
+            sheet.append(row_cells)
+
+        workbook.save(filename)
+
+    def _compute_column_widths(self, columns, rows):
+        """
+        Computes display widths in one streaming pass over the row tuples:
+        a per-column running max of each cell's first line, floored by the
+        header length.
+        """
+        max_lengths = [len(str(col_name)) for col_name in columns]
+        for row in rows:
+            for idx, value in enumerate(row):
+                text = str(value)
+                newline = text.find('\n')
+                if newline != -1:
+                    text = text[:newline]
+                if len(text) > max_lengths[idx]:
+                    max_lengths[idx] = len(text)
+        return [min(length + 2, 70) for length in max_lengths]
+
+    def _build_refund_index(self, refunds):
+        """
+        Aggregates an order's refunded quantities into a
+        {(product_id, variation_id): qty} dict, so the per-item lookup is an
+        O(1) probe instead of a rescan of every refund for every line item.
+        """
+        refund_map = {}
+        for refund in refunds:
+            for refunded_item in refund.get('line_items', []):
+                key = (refunded_item.get('product_id'), refunded_item.get('variation_id', 0))
+                refund_map[key] = refund_map.get(key, 0) + refunded_item.get('qty', 0)
+        return refund_map
+
+    def _get_buyer_name(self, billing, user_type):
         """Helper to get buyer name based on user type."""
-        user_type = next((meta['value'] for meta in order.get('meta_data', []) if meta['key'] == '_user_type'), 'individual')
         if user_type == 'corporate':
-            return order.get('billing', {}).get('company', '')
+            return billing.get('company', '')
         else:
-            first_name = order.get('billing', {}).get('first_name', '')
-            last_name = order.get('billing', {}).get('last_name', '')
+            first_name = billing.get('first_name', '')
+            last_name = billing.get('last_name', '')
             return f"{first_name} {last_name}".strip()
 
     def create_excel_report(self, orders_data):
         """
         Processes order data and generates two Excel reports for the previous day.
         """
+        import jdatetime
+        import numpy as np
+        from openpyxl import load_workbook
+
         processed_data = []
 
         yesterday_dt = datetime.now() - timedelta(days=1)
@@ -38,189 +264,175 @@ class ExcelReporter:
         templated_output_filename = None
         templated_output_filename_base = f"tis-{report_date_str}.xlsx"
 
-        workbook_template = None
-        sheet_body = None
-        current_row_for_template = 0
+        # The template copy and load_workbook happen lazily after the order
+        # loop, and only if at least one individual-customer row was buffered:
+        # on corporate-only days the whole templated path (openpyxl's load of
+        # the styled template is the slowest single step) is skipped.
+        template_available = os.path.exists(template_file)
+        template_rows = []
 
-        if os.path.exists(template_file):
-            try:
-                counter = 1
-                unique_templated_output_filename = templated_output_filename_base
-                while os.path.exists(unique_templated_output_filename):
-                    unique_templated_output_filename = f"tis-{report_date_str}_{counter}.xlsx"
-                    counter += 1
-                templated_output_filename = unique_templated_output_filename
-
-                shutil.copy(template_file, templated_output_filename)
-                workbook_template = load_workbook(templated_output_filename)
-                
-                if "بدنه" in workbook_template.sheetnames:
-                    sheet_body = workbook_template["بدنه"]
-                    START_ROW_BODY = 2
-                    current_row_for_template = START_ROW_BODY
-                else:
-                    logger.warning(f"WARNING: Sheet 'بدنه' not found in '{template_file}'. Templated report will not be generated.")
-                    workbook_template = None
-            except Exception as e:
-                logger.error(f"ERROR: Could not copy or load template file '{template_file}': {e}.")
-                workbook_template = None
-        else:
-            logger.error(f"ERROR: Template file '{template_file}' not found. Cannot create templated report.")
+        if not template_available:
+            logger.error("ERROR: Template file '%s' not found. Cannot create templated report.", template_file)
 
 
         for order in orders_data:
             try:
+                refunds = order.get('refunds') or ()
+                refund_map = self._build_refund_index(refunds)
+                order_refund_total = sum(float(refund.get('total', 0)) for refund in refunds)
                 # --- Common Data Extraction for both reports ---
-                user_type = next((meta['value'] for meta in order.get('meta_data', []) if meta['key'] == '_user_type'), 'individual')
-                
-                company_name = order.get('billing', {}).get('company', '') if user_type == 'corporate' else ''
-                national_id = next((meta['value'] for meta in order.get('meta_data', []) if meta['key'] == '_co_national_id'), '') if user_type == 'corporate' else ''
-                register_id = next((meta['value'] for meta in order.get('meta_data', []) if meta['key'] == '_register_id'), '') if user_type == 'corporate' else ''
+                # Build the meta_data mapping once so every lookup below is an
+                # O(1) dict access instead of a scan over the meta list.
+                meta = {m['key']: m['value'] for m in order.get('meta_data') or ()}
+                user_type = meta.get('_user_type', 'individual')
+                billing = order.get('billing') or {}
 
-                item_names = []
-                item_quantities = []
-                item_prices_no_tax = []
-                item_vat_amounts = []
-                total_items_vat = 0.0
-                total_items_price_no_tax = 0.0
+                company_name = billing.get('company', '') if user_type == 'corporate' else ''
+                national_id = meta.get('_co_national_id', '') if user_type == 'corporate' else ''
+                register_id = meta.get('_register_id', '') if user_type == 'corporate' else ''
 
-                buyer_name = self._get_buyer_name(order) 
+                buyer_name = self._get_buyer_name(billing, user_type)
 
-                # Process line items for both reports
-                for item in order.get('line_items', []):
-                    item_name = item['name']
-                    quantity = item.get('quantity', 0)
-                    item_total_price = float(item.get('total', 0))
-
-                    refunded_qty_for_this_item = 0
-                    for refund in order.get('refunds', []):
-                        for refunded_item in refund.get('line_items', []):
-                            if refunded_item.get('product_id') == item.get('product_id') and \
-                               refunded_item.get('variation_id', 0) == item.get('variation_id', 0):
-                                refunded_qty_for_this_item += refunded_item.get('qty', 0)
-                    
-                    effective_quantity = quantity - refunded_qty_for_this_item
-                    
+                # Vectorize the per-item VAT arithmetic: one pass of C-level
+                # array math instead of Python float operations per line item.
+                line_items = order.get('line_items', [])
+                item_count = len(line_items)
+                quantities = np.fromiter(
+                    (item.get('quantity', 0) for item in line_items), dtype=np.int64, count=item_count)
+                item_totals = np.fromiter(
+                    (float(item.get('total', 0)) for item in line_items), dtype=np.float64, count=item_count)
+                refunded = np.fromiter(
+                    (refund_map.get((item.get('product_id'), item.get('variation_id', 0)), 0)
+                     for item in line_items),
+                    dtype=np.int64, count=item_count)
+                effective_quantities = quantities - refunded
+                # Per-item totals excluding VAT and the VAT share (zero for
+                # non-positive totals, matching the old per-item branches).
+                prices_no_tax = np.where(item_totals > 0, item_totals / 1.10, 0.0)
+                vat_amounts = item_totals - prices_no_tax
+                sold_mask = effective_quantities > 0
+                total_items_price_no_tax = float(prices_no_tax[sold_mask].sum())
+                total_items_vat = float(vat_amounts[sold_mask].sum())
+
+                # Format the numeric columns in batch over the masked arrays
+                # instead of interleaving f-strings with the arithmetic.
+                item_quantities = [str(quantity) for quantity in effective_quantities[sold_mask].tolist()]
+                item_prices_no_tax = [f"{price:,.0f}" for price in prices_no_tax[sold_mask].tolist()]
+                item_vat_amounts = [f"{vat:,.0f}" for vat in vat_amounts[sold_mask].tolist()]
+
+                # Names / template rows only for the surviving items
+                item_names = []
+                for idx, item in enumerate(line_items):
+                    effective_quantity = int(effective_quantities[idx])
                     if effective_quantity <= 0:
                         continue
 
-                    if item_total_price > 0:
-                        price_no_tax_per_item = (item_total_price / 1.10) / effective_quantity
-                        vat_per_item = (item_total_price / effective_quantity) - price_no_tax_per_item
-                    else:
-                        price_no_tax_per_item = 0.0
-                        vat_per_item = 0.0
-                    
+                    item_name = item['name']
                     item_names.append(item_name)
-                    item_quantities.append(str(effective_quantity)) 
-                    item_prices_no_tax.append(f"{price_no_tax_per_item * effective_quantity:,.0f}")
-                    item_vat_amounts.append(f"{vat_per_item * effective_quantity:,.0f}")
-
-                    total_items_vat += (vat_per_item * effective_quantity)
-                    total_items_price_no_tax += (price_no_tax_per_item * effective_quantity)
-
-                    # Populate the templated Excel file (only for individual customers)
-                    if workbook_template and sheet_body and user_type == 'individual':
-                        COL_DESCRIPTION, COL_QUANTITY, COL_UNIT, COL_UNIT_PRICE, COL_DISCOUNT, COL_VAT_RATE, COL_OTHER_TAX_SUBJECT = 3, 4, 5, 6, 10, 11, 12
-                        try:
-                            sheet_body.cell(row=current_row_for_template, column=COL_DESCRIPTION, value=item_name)
-                            sheet_body.cell(row=current_row_for_template, column=COL_QUANTITY, value=effective_quantity)
-                            sheet_body.cell(row=current_row_for_template, column=COL_UNIT, value="عدد")
-                            sheet_body.cell(row=current_row_for_template, column=COL_UNIT_PRICE, value=round(price_no_tax_per_item)) 
-                            sheet_body.cell(row=current_row_for_template, column=COL_DISCOUNT, value=0)
-                            sheet_body.cell(row=current_row_for_template, column=COL_VAT_RATE, value=10)
-                            sheet_body.cell(row=current_row_for_template, column=COL_OTHER_TAX_SUBJECT, value=buyer_name)
-                            current_row_for_template += 1
-                        except Exception as e:
-                            logger.error(f"ERROR: Error writing item '{item_name}' of order {order.get('id', 'N/A')} to templated report: {e}")
-
-                order_refund_total = sum(float(refund.get('total', 0)) for refund in order.get('refunds', []))
-                created_datetime_obj = datetime.strptime(order['date_created'], '%Y-%m-%dT%H:%M:%S')
-                jalali_date = jdatetime.datetime.fromgregorian(datetime=created_datetime_obj)
-                formatted_jalali_date = jalali_date.strftime('%Y/%m/%d %H:%M:%S')
-
-                custom_order_number = next((meta['value'] for meta in order.get('meta_data', []) if meta['key'] in ['_wc_order_number', '_order_number']), order.get('id'))
-
-                order_row = {
-                    "شماره سفارش": custom_order_number, "تاریخ سفارش (شمسی)": formatted_jalali_date,
-                    "نام": order.get('billing', {}).get('first_name', ''), "نام خانوادگی": order.get('billing', {}).get('last_name', ''),
-                    "نام شرکت": company_name, "شناسه ملی": national_id, "شماره ثبت": register_id,
-                    "آدرس": f"{order.get('billing', {}).get('address_1', '')} {order.get('billing', {}).get('address_2', '')}".strip(),
-                    "شهر": order.get('billing', {}).get('city', ''), "کد پستی": order.get('billing', {}).get('postcode', ''),
-                    "تلفن": order.get('billing', {}).get('phone', ''), "عنوان روش پرداخت": order.get('payment_method_title', ''),
-                    "مبلغ تخفیف": float(order.get('discount_total', 0)),
-                    "مجموع مبلغ سفارش (با مالیات)": float(order.get('total', 0)),
-                    "مجموع نهایی سفارش (بدون مالیات)": total_items_price_no_tax,
-                    "مجموع مالیات بر ارزش افزوده": total_items_vat,
-                    "روش حمل و نقل": order.get('shipping_lines', [{}])[0].get('method_title', '') if order.get('shipping_lines') else '',
-                    "مبلغ حمل و نقل": float(order.get('shipping_lines', [{}])[0].get('total', 0)) if order.get('shipping_lines') else 0,
-                    "مبلغ استرداد کل سفارش": order_refund_total,
-                    "مجموع نهایی سفارش (پس از کسر استرداد و با مالیات)": float(order.get('total', 0)) - order_refund_total,
-                    "نام آیتم‌ها": "\n".join(item_names), "تعداد آیتم‌ها (- استرداد)": "\n".join(item_quantities),
-                    "قیمت واحد آیتم (بدون مالیات)": "\n".join(item_prices_no_tax), "مالیات بر ارزش افزوده آیتم": "\n".join(item_vat_amounts),
-                    "مجموع هزینه آیتم‌ها (با مالیات)": sum(float(item.get('total', 0)) for item in order.get('line_items', []))
-                }
+
+                    # Buffer a row for the templated Excel file (only for
+                    # individual customers); the cells are written in one bulk
+                    # pass after the loop instead of per item.
+                    if template_available and user_type == 'individual':
+                        template_rows.append(
+                            (item_name, effective_quantity,
+                             round(float(prices_no_tax[idx]) / effective_quantity), buyer_name))
+
+                formatted_jalali_date = _format_jalali_datetime(order['date_created'])
+
+                custom_order_number = meta.get('_wc_order_number') or meta.get('_order_number') or order.get('id')
+
+                shipping_lines = order.get('shipping_lines')
+                # Values in MAIN_REPORT_COLUMNS order.
+                order_row = (
+                    order['date_created'],
+                    custom_order_number, formatted_jalali_date,
+                    billing.get('first_name', ''), billing.get('last_name', ''),
+                    company_name, national_id, register_id,
+                    f"{billing.get('address_1', '')} {billing.get('address_2', '')}".strip(),
+                    billing.get('city', ''), billing.get('postcode', ''),
+                    billing.get('phone', ''), order.get('payment_method_title', ''),
+                    float(order.get('discount_total', 0)),
+                    float(order.get('total', 0)),
+                    total_items_price_no_tax,
+                    total_items_vat,
+                    shipping_lines[0].get('method_title', '') if shipping_lines else '',
+                    float(shipping_lines[0].get('total', 0)) if shipping_lines else 0,
+                    order_refund_total,
+                    float(order.get('total', 0)) - order_refund_total,
+                    "\n".join(item_names), "\n".join(item_quantities),
+                    "\n".join(item_prices_no_tax), "\n".join(item_vat_amounts),
+                    float(item_totals.sum()),
+                )
                 processed_data.append(order_row)
             except Exception as e:
-                logger.error(f"ERROR: Error processing order {order.get('id', 'N/A')}: {e}.")
+                logger.error("ERROR: Error processing order %s: %s.", order.get('id', 'N/A'), e)
                 continue
 
-        # Save the templated workbook
-        if workbook_template and templated_output_filename:
+        # Copy, fill and save the templated workbook. The "بدنه" sheet has
+        # pre-styled rows at fixed positions, so rows are written positionally
+        # from row 2 rather than appended.
+        if template_available and template_rows:
             try:
-                workbook_template.save(templated_output_filename)
-                logger.info(f"INFO: Templated Excel file '{templated_output_filename}' generated successfully.")
+                # Claim the first free filename atomically with O_EXCL: one
+                # syscall per candidate and no check-then-create race with a
+                # concurrently running report.
+                for counter in range(1000):
+                    candidate = templated_output_filename_base if counter == 0 else f"tis-{report_date_str}_{counter}.xlsx"
+                    try:
+                        os.close(os.open(candidate, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+                    except FileExistsError:
+                        continue
+                    templated_output_filename = candidate
+                    break
+
+                # copyfile skips the mode-bit copy of shutil.copy and uses the
+                # kernel fast-copy path (sendfile/copy_file_range) on Linux.
+                shutil.copyfile(template_file, templated_output_filename)
+                # keep_links=False skips parsing external-link parts. Formulas
+                # are kept (no data_only=True): re-saving with cached values
+                # would strip them from the deliverable.
+                workbook_template = load_workbook(templated_output_filename, keep_vba=False, keep_links=False)
+
+                if "بدنه" in workbook_template.sheetnames:
+                    sheet_body = workbook_template["بدنه"]
+                    for row_idx, (item_name, effective_quantity, unit_price, buyer_name) in enumerate(template_rows, TEMPLATE_START_ROW):
+                        sheet_body.cell(row=row_idx, column=TEMPLATE_COL_DESCRIPTION, value=item_name)
+                        sheet_body.cell(row=row_idx, column=TEMPLATE_COL_QUANTITY, value=effective_quantity)
+                        sheet_body.cell(row=row_idx, column=TEMPLATE_COL_UNIT, value="عدد")
+                        sheet_body.cell(row=row_idx, column=TEMPLATE_COL_UNIT_PRICE, value=unit_price)
+                        sheet_body.cell(row=row_idx, column=TEMPLATE_COL_DISCOUNT, value=0)
+                        sheet_body.cell(row=row_idx, column=TEMPLATE_COL_VAT_RATE, value=10)
+                        sheet_body.cell(row=row_idx, column=TEMPLATE_COL_OTHER_TAX_SUBJECT, value=buyer_name)
+                    workbook_template.save(templated_output_filename)
+                    logger.info("INFO: Templated Excel file '%s' generated successfully.", templated_output_filename)
+                else:
+                    logger.warning("WARNING: Sheet 'بدنه' not found in '%s'. Templated report will not be generated.", template_file)
+                    templated_output_filename = None
             except Exception as e:
-                logger.error(f"ERROR: Error saving templated Excel file '{templated_output_filename}': {e}")
+                logger.error("ERROR: Error creating templated Excel file '%s': %s", templated_output_filename, e)
                 templated_output_filename = None
-        else:
-            templated_output_filename = None
 
         # --- Generate the main comprehensive report ---
         if not processed_data:
              return None, []
              
-        df = pd.DataFrame(processed_data)
-        if "تاریخ سفارش (شمسی)" in df.columns:
-            df = df.sort_values(by="تاریخ سفارش (شمسی)", ascending=True)
+        # Sort chronologically on the leading _date_created key, then strip it.
+        processed_data.sort(key=lambda row: row[0])
+        report_rows = [row[1:] for row in processed_data]
+        report_columns = MAIN_REPORT_COLUMNS[1:]
+
+        if self.write_parquet:
+            self._write_parquet_archive(report_columns, report_rows, f"Orders_سایت_{report_date_str}.parquet")
 
         # ===> [تغییر] استفاده از نام و تاریخ جدید برای فایل اصلی
         main_excel_filename = f"Orders_سایت_{report_date_str}.xlsx"
         try:
-            df.to_excel(main_excel_filename, index=False, engine='openpyxl')
-
-            # --- Apply Excel Styling to main report ---
-            workbook = load_workbook(main_excel_filename)
-            sheet = workbook.active
-            header_fill = PatternFill(start_color="CCE0F0", end_color="CCE0F0", fill_type="solid")
-            header_font = Font(bold=True)
-            item_name_fill = PatternFill(start_color="F0FFF0", end_color="F0FFF0", fill_type="solid")
-            wrap_text_alignment = Alignment(wrapText=True, vertical='top')
-
-            for col_idx, cell in enumerate(sheet[1], 1):
-                cell.fill = header_fill
-                cell.font = header_font
-                cell.alignment = Alignment(horizontal='center', vertical='center')
-                max_length = max(len(str(cell_in_col.value).split('\n')[0]) for cell_in_col in sheet[get_column_letter(col_idx)] if cell_in_col.value is not None)
-                adjusted_width = (max_length + 2)
-                sheet.column_dimensions[get_column_letter(col_idx)].width = min(adjusted_width, 70)
-
-            sheet.freeze_panes = sheet['A2']
-            
-            wrap_columns = ["نام آیتم‌ها", "تعداد آیتم‌ها (- استرداد)", "قیمت واحد آیتم (بدون مالیات)", "مالیات بر ارزش افزوده آیتم", "آدرس"]
-            for row in sheet.iter_rows(min_row=2):
-                for cell in row:
-                    col_title = sheet.cell(row=1, column=cell.column).value
-                    if col_title in wrap_columns:
-                        cell.alignment = wrap_text_alignment
-                    if col_title == "نام آیتم‌ها":
-                        cell.fill = item_name_fill
-
-            workbook.save(main_excel_filename)
-            logger.info(f"INFO: Main Excel file '{main_excel_filename}' generated and styled successfully.")
+            self._write_main_report(report_columns, report_rows, main_excel_filename)
+            logger.info("INFO: Main Excel file '%s' generated and styled successfully.", main_excel_filename)
             
             return main_excel_filename, [templated_output_filename] if templated_output_filename and os.path.exists(templated_output_filename) else []
 
         except Exception as e:
-            logger.error(f"ERROR: Error creating or styling main Excel file '{main_excel_filename}': {e}")
+            logger.error("ERROR: Error creating or styling main Excel file '%s': %s", main_excel_filename, e)
             return None, [templated_output_filename] if templated_output_filename and os.path.exists(templated_output_filename) else []
\ No newline at end of file
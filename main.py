@@ -29,7 +29,7 @@ def main():
             consumer_key=Config.WOO_CONSUMER_KEY,
             consumer_secret=Config.WOO_CONSUMER_SECRET
         )
-        excel_reporter = ExcelReporter()
+        excel_reporter = ExcelReporter(write_parquet=Config.WRITE_PARQUET)
         email_sender = EmailSender(
             sender_email=Config.EMAIL_SENDER,
             sender_password=Config.EMAIL_PASSWORD,
@@ -40,34 +40,35 @@ def main():
         )
 
         # 3. Execute Workflow
-        orders = woo_client.get_orders_from_yesterday()
+        # Orders are streamed straight from pagination into the reporter, so
+        # the full day's payload is never buffered here.
+        # excel_reporter.create_excel_report returns two values:
+        # main_report_path: path to Orders_سایت_YYYY-MM-DD.xlsx (None when no orders)
+        # templated_report_paths: a list containing path(s) to tis-YYYY-MM-DD.xlsx
+        main_report_path, templated_report_paths = excel_reporter.create_excel_report(
+            woo_client.iter_orders_from_yesterday()
+        )
 
-        if orders:
-            # excel_reporter.create_excel_report now returns two values:
-            # main_report_path: path to WooCommerce_Orders_YYYY-MM-DD.xlsx
-            # templated_report_paths: a list containing path(s) to tis-YYYY-MM-DD.xlsx
-            main_report_path, templated_report_paths = excel_reporter.create_excel_report(orders)
-            
-            # Collect all generated file paths for email attachment
-            all_excel_files_to_attach = []
-            if main_report_path:
-                all_excel_files_to_attach.append(main_report_path)
-            if templated_report_paths: # This will be a list, iterate to add
-                all_excel_files_to_attach.extend(templated_report_paths)
+        # Collect all generated file paths for email attachment
+        all_excel_files_to_attach = []
+        if main_report_path:
+            all_excel_files_to_attach.append(main_report_path)
+        if templated_report_paths: # This will be a list, iterate to add
+            all_excel_files_to_attach.extend(templated_report_paths)
 
-            if all_excel_files_to_attach:
-                if email_config_valid: # Only try to send email if config is valid
-                    # Pass the list of all file paths to the email sender
-                    email_sender.send_email_report(all_excel_files_to_attach)
-                else:
-                    logger.warning("WARNING: Email configuration incomplete. Reports generated but not sent via email.")
+        if all_excel_files_to_attach:
+            if email_config_valid: # Only try to send email if config is valid
+                # Pass the list of all file paths to the email sender
+                email_sender.send_email_report(all_excel_files_to_attach)
             else:
-                logger.error("ERROR: No Excel files were created, skipping email sending.")
+                logger.warning("WARNING: Email configuration incomplete. Reports generated but not sent via email.")
         else:
-            logger.info("INFO: No orders found for the previous day. No Excel report or email will be generated.")
+            logger.info("INFO: No Excel files were created, skipping email sending.")
+
+        email_sender.close() # Release the cached SMTP connection, if one was opened
 
     except Exception as e:
-        logger.critical(f"CRITICAL: Script terminated due to a critical error: {e}", exc_info=True)
+        logger.critical("CRITICAL: Script terminated due to a critical error: %s", e, exc_info=True)
         sys.exit(1) # Exit with an error code
 
 if __name__ == "__main__":
@@ -1,9 +1,33 @@
 from woocommerce import API
+import woocommerce.api
+import requests
+from requests.adapters import HTTPAdapter, Retry
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import logging
 
+# orjson parses the multi-MB orders payloads several times faster than the
+# stdlib json module and works on the raw bytes without a utf-8 decode pass.
+# It stays optional: without it responses are parsed with requests' built-in
+# .json().
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
+
+def _parse_json(response):
+    """Decodes a JSON response body, preferring orjson when available."""
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
+
+# Upper bound on parallel page requests, kept low to stay friendly to the
+# store's rate limits.
+MAX_CONCURRENT_PAGE_FETCHES = 4
+
 class WooCommerceClient:
     """
     Handles interactions with the WooCommerce API.
@@ -16,47 +40,97 @@ class WooCommerceClient:
                 consumer_secret=consumer_secret,
                 version="wc/v3"
             )
+
+            # The stock woocommerce.API calls requests.request, which opens a
+            # fresh TCP+TLS connection per page. Route its module-level
+            # request function through a pooled Session so paginated fetches
+            # reuse connections, with retries on transient server errors.
+            self._session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=MAX_CONCURRENT_PAGE_FETCHES + 1,
+                max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+            )
+            self._session.mount("https://", adapter)
+            self._session.mount("http://", adapter)
+            woocommerce.api.request = self._session.request
+
             logger.info("INFO: WooCommerce API client initialized.")
         except Exception as e:
-            logger.critical(f"FATAL: Error configuring WooCommerce API: {e}")
+            logger.critical("FATAL: Error configuring WooCommerce API: %s", e)
             raise  # Re-raise the exception to be caught in main or higher level
 
-    def get_orders_from_yesterday(self):
+    def _fetch_orders_page(self, yesterday, page, per_page=100):
+        """Fetches a single page of yesterday's orders and returns the raw response."""
+        return self.wcapi.get("orders", params={
+            "status": "completed,processing",
+            "after": f"{yesterday}T00:00:00",
+            "before": f"{yesterday}T23:59:59",
+            "per_page": per_page,
+            "page": page
+        })
+
+    def iter_orders_from_yesterday(self):
         """
-        Fetches all completed and processing orders from the previous day from the WooCommerce API.
+        Yields completed and processing orders from the previous day as their
+        pages arrive, so the consumer can process orders while later pages are
+        still in flight and no full-day payload is ever buffered here. The
+        first page is fetched synchronously to learn the total page count from
+        the X-WP-TotalPages header; the remaining pages are requested
+        concurrently instead of one round-trip at a time.
         """
         yesterday_dt = datetime.now() - timedelta(days=1)
         yesterday = yesterday_dt.strftime('%Y-%m-%d')
-        
-        all_orders = []
-        page = 1
-        per_page = 100
+
+        completed_count = 0
+        processing_count = 0
+        found_any = False
+
+        def count_and_yield(page_json):
+            nonlocal completed_count, processing_count, found_any
+            for order in page_json:
+                found_any = True
+                status = order.get('status')
+                if status == 'completed':
+                    completed_count += 1
+                elif status == 'processing':
+                    processing_count += 1
+                yield order
 
         try:
-            while True:
-                response_json = self.wcapi.get("orders", params={
-                    "status": "completed,processing",
-                    "after": f"{yesterday}T00:00:00",
-                    "before": f"{yesterday}T23:59:59",
-                    "per_page": per_page,
-                    "page": page
-                }).json()
-
-                if not isinstance(response_json, list) or not response_json:
-                    break
-                
-                all_orders.extend(response_json)
-                page += 1
+            first_response = self._fetch_orders_page(yesterday, 1)
+            first_page = _parse_json(first_response)
+            if isinstance(first_page, list) and first_page:
+                yield from count_and_yield(first_page)
+
+                try:
+                    total_pages = int(first_response.headers.get('X-WP-TotalPages', 1))
+                except (TypeError, ValueError):
+                    total_pages = 1
+
+                if total_pages > 1:
+                    workers = min(MAX_CONCURRENT_PAGE_FETCHES, total_pages - 1)
+                    with ThreadPoolExecutor(max_workers=workers) as executor:
+                        remaining = executor.map(
+                            lambda page: _parse_json(self._fetch_orders_page(yesterday, page)),
+                            range(2, total_pages + 1))
+                        for page_json in remaining:
+                            if isinstance(page_json, list):
+                                yield from count_and_yield(page_json)
 
         except Exception as e:
-            logger.error(f"ERROR: Error fetching orders for {yesterday}: {e}")
+            logger.error("ERROR: Error fetching orders for %s: %s", yesterday, e)
             raise
 
-        if not all_orders:
-            logger.info(f"INFO: No completed or processing orders found for {yesterday}.")
+        if not found_any:
+            logger.info("INFO: No completed or processing orders found for %s.", yesterday)
         else:
-            completed_count = len([order for order in all_orders if order.get('status') == 'completed'])
-            processing_count = len([order for order in all_orders if order.get('status') == 'processing'])
-            logger.info(f"INFO: Found {completed_count} completed orders and {processing_count} processing orders for {yesterday}.")
+            logger.info("INFO: Found %d completed orders and %d processing orders for %s.", completed_count, processing_count, yesterday)
 
-        return all_orders
\ No newline at end of file
+    def get_orders_from_yesterday(self):
+        """
+        Fetches all of yesterday's orders into a list. Kept for callers that
+        need the whole day at once; iter_orders_from_yesterday is preferred
+        when the orders are consumed in a single pass.
+        """
+        return list(self.iter_orders_from_yesterday())
\ No newline at end of file